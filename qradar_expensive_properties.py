@@ -19,14 +19,31 @@ Cómo obtener el archivo desde QRadar (SSH en el EC):
     /opt/qradar/support/getCustomPropertyStats.sh > CustomProperties-$(hostname)-$(date +%Y%m%d).tabular
 """
 
+import bisect
 import csv
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 import sys
 import os
 import re
 import argparse
 from datetime import datetime
+from html import escape
 from pathlib import Path
 
+# pandas es opcional: acelera el parseo en archivos grandes, pero el script
+# debe seguir funcionando con el Python pelado de una consola QRadar.
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # UMBRALES (en nanosegundos, igual que el archivo)
@@ -43,33 +60,85 @@ THRESHOLDS = {
 # EPS de referencia para calcular impacto (ajustar según tu entorno)
 REFERENCE_EPS = 1000
 
+# Paletas fijas — definidas una vez a nivel de módulo, no por fila/issue
+_ACTION_COLORS = {
+    "DESHABILITAR": "#dc2626",
+    "REESCRIBIR":   "#9333ea",
+    "OPTIMIZAR":    "#d97706",
+    "REVISAR":      "#2563eb",
+    "MONITOREAR":   "#16a34a",
+}
+
+_LEVEL_ICONS = {"CRÍTICO": "🔴", "ALTO": "🟠", "MEDIO": "🟡", "BAJO": "🔵", "INFO": "ℹ️"}
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # ANÁLISIS DE REGEX
 # ─────────────────────────────────────────────────────────────────────────────
+# Patrones de inspección compilados una sola vez a nivel de módulo: analyze_regex
+# se ejecuta por cada propiedad del archivo y recompilar en cada llamada es puro
+# costo de intérprete.
+_RE_CATASTROPHIC = re.compile(r'\(.*[\+\*].*\)[\+\*\?]')
+
+# Los tres detectores puntuales (lazy, greedy, lookaround) son mutuamente
+# excluyentes, así que se fusionan en una sola alternación con grupos nombrados:
+# una pasada sobre el patrón en vez de tres. El catastrófico queda aparte porque
+# su match abarca todo el grupo y "taparía" los cuantificadores internos.
+_PATTERN_SCAN = re.compile(
+    r'(?P<lazy>\.[\*\+]\?)'
+    r'|(?P<greedy>(?<!\[)\.[\*\+](?!\?))'
+    r'|(?P<look>\(\?[=!<])'
+)
+
+
+@functools.lru_cache(maxsize=8192)
+def _cached_compile(pattern):
+    """re.compile memoizado a nivel de proceso.
+
+    Punto único para cuando haga falta compilar los patrones de las custom
+    properties (validación, test-match contra payloads): el mismo regex suele
+    repetirse en decenas de log sources y la caché interna de re es pequeña
+    y compartida con el resto del programa.
+    """
+    return re.compile(pattern)
+
+
+@functools.lru_cache(maxsize=4096)
 def analyze_regex(pattern):
     """
     Detecta patrones anti-performáticos en la regex.
-    Devuelve lista de problemas encontrados.
+    Devuelve tupla de problemas encontrados.
+
+    Los exports reales repiten el mismo patrón en muchos log sources, así que
+    el resultado se memoiza por string de patrón (función pura → lru_cache).
     """
     issues = []
 
     if not pattern:
-        return issues
+        return ()
 
     # Backtracking catastrófico: grupos anidados con cuantificadores
-    if re.search(r'\(.*[\+\*].*\)[\+\*\?]', pattern):
+    if _RE_CATASTROPHIC.search(pattern):
         issues.append(("CRÍTICO", "Posible backtracking catastrófico: cuantificadores anidados como `(.*+)+` o `(.+)*`. Puede causar timeout completo del parser."))
 
+    # Una sola pasada para lazy/greedy/lookaround
+    lazy_count = greedy_count = look_count = 0
+    for m in _PATTERN_SCAN.finditer(pattern):
+        group = m.lastgroup
+        if group == "lazy":
+            lazy_count += 1
+        elif group == "greedy":
+            greedy_count += 1
+        else:
+            look_count += 1
+
     # Lazy quantifiers amplios: .*? o .+? sin ancla
-    lazy_count = len(re.findall(r'\.\*\?|\.\+\?', pattern))
     if lazy_count >= 2:
         issues.append(("ALTO", f"Múltiples lazy quantifiers (`.*?` o `.+?`): {lazy_count} encontrados. Cada uno fuerza backtracking adicional. Usar clases de caracteres negadas `[^delimitador]+` en su lugar."))
     elif lazy_count == 1:
         issues.append(("MEDIO", "Lazy quantifier (`.*?` o `.+?`) detectado. Considerar reemplazar con clase negada `[^delimitador]+` para mejor rendimiento."))
 
     # Greedy sin límite: .* o .+ sin anclaje
-    greedy_count = len(re.findall(r'(?<!\[)\.[\*\+](?!\?)', pattern))
     if greedy_count >= 3:
         issues.append(("ALTO", f"Múltiples greedy quantifiers sin límite (`.*` o `.+`): {greedy_count} encontrados. Reducir el scope usando anclas o delimitadores específicos."))
     elif greedy_count >= 1:
@@ -83,7 +152,7 @@ def analyze_regex(pattern):
         issues.append(("MEDIO", f"Alternación con {pipe_count} opciones. Ordenar de mayor a menor frecuencia esperada para mejorar rendimiento."))
 
     # Lookahead / lookbehind
-    if re.search(r'\(\?[=!<]', pattern):
+    if look_count:
         issues.append(("MEDIO", "Lookahead o lookbehind detectado. Aunque son válidos, pueden impactar rendimiento en payloads largos. Evaluar si son necesarios."))
 
     # Regex muy larga (>100 chars)
@@ -94,47 +163,96 @@ def analyze_regex(pattern):
     if not pattern.startswith('^') and not pattern.endswith('$') and '\\A' not in pattern and '\\Z' not in pattern:
         issues.append(("INFO", "Sin anclas `^` o `$`. Agregar anclas cuando sea posible para reducir el espacio de búsqueda del motor regex."))
 
-    return issues
+    return tuple(issues)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # CLASIFICACIÓN DE SEVERIDAD
 # ─────────────────────────────────────────────────────────────────────────────
+# Umbrales ordenados + tabla paralela de (label, color, icono): la clasificación
+# se reduce a una búsqueda binaria sin cadena de ifs.
+_SEV_THRESHOLDS = (THRESHOLDS["medium"], THRESHOLDS["high"], THRESHOLDS["critical"])
+_SEV_TABLE = (
+    ("BAJO",    "#16a34a", "🟢"),
+    ("MEDIO",   "#ca8a04", "🟡"),
+    ("ALTO",    "#ea580c", "🟠"),
+    ("CRÍTICO", "#dc2626", "🔴"),
+)
+
+
 def classify_severity(avg_ns):
-    if avg_ns >= THRESHOLDS["critical"]:
-        return "CRÍTICO", "#dc2626", "🔴"
-    elif avg_ns >= THRESHOLDS["high"]:
-        return "ALTO", "#ea580c", "🟠"
-    elif avg_ns >= THRESHOLDS["medium"]:
-        return "MEDIO", "#ca8a04", "🟡"
-    else:
-        return "BAJO", "#16a34a", "🟢"
+    return _SEV_TABLE[bisect.bisect_right(_SEV_THRESHOLDS, avg_ns)]
+
+
+# Copia de los umbrales como ndarray para clasificar lotes con searchsorted
+_SEV_THRESHOLDS_ARR = np.asarray(_SEV_THRESHOLDS, dtype=np.float64) if np is not None else None
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # LÓGICA DE RECOMENDACIÓN
 # ─────────────────────────────────────────────────────────────────────────────
+@functools.lru_cache(maxsize=4096)
+def _rec_core(pattern, sev_bucket, has_cancelled, times_bucket):
+    """
+    Núcleo cacheable de get_recommendation: decide (acción, prioridad, rama).
+
+    Las ramas de decisión solo dependen del tier de severidad (0=bajo..3=crítico),
+    de si hubo cancelaciones y del bucket de volumen de llamadas (0: <100,
+    1: 100–1000, 2: >1000) — no de los valores exactos — así que el resultado
+    se memoiza junto con los issues de regex del patrón. Los textos con cifras
+    concretas se formatean en el wrapper.
+    """
+    # La inspección del patrón es lo más caro de la recomendación; para
+    # propiedades benignas (tier bajo, sin cancelaciones) no aporta nada
+    # accionable, así que se omite por completo.
+    if has_cancelled or sev_bucket >= 1:
+        regex_issues = analyze_regex(pattern)
+    else:
+        regex_issues = ()
+
+    if has_cancelled:
+        action, priority, branch = "DESHABILITAR", 1, "cancelled"
+    elif sev_bucket >= 3 and times_bucket == 2:
+        action, priority, branch = "REESCRIBIR", 1, "critical_volume"
+    elif sev_bucket >= 3 and times_bucket == 0:
+        action, priority, branch = "REVISAR", 2, "critical_low_volume"
+    elif sev_bucket >= 2:
+        action, priority, branch = "OPTIMIZAR", 2, "high"
+    elif sev_bucket >= 1:
+        action, priority, branch = "REVISAR", 3, None
+    else:
+        action, priority, branch = "MONITOREAR", 4, None
+
+    return action, priority, branch, regex_issues
+
+
 def get_recommendation(prop):
-    avg_ns      = prop["avg_ns"]
-    max_ns      = prop["max_ns"]
-    min_ns      = prop["min_ns"]
-    times_called = prop["times_called"]
-    cancelled   = prop["cancelled"]
-    pattern     = prop["pattern"]
+    avg_ns      = prop.avg_ns
+    max_ns      = prop.max_ns
+    times_called = prop.times_called
+    cancelled   = prop.cancelled
+    pattern     = prop.pattern
     avg_ms      = avg_ns / NS_PER_MS
 
-    recommendations = []
-    action = "MONITOREAR"
-    priority = 4
+    if avg_ns >= THRESHOLDS["critical"]:
+        sev_bucket = 3
+    elif avg_ns >= THRESHOLDS["high"]:
+        sev_bucket = 2
+    elif avg_ns >= THRESHOLDS["medium"]:
+        sev_bucket = 1
+    else:
+        sev_bucket = 0
+    times_bucket = 2 if times_called > 1000 else (0 if times_called < 100 else 1)
 
-    # Regex issues
-    regex_issues = analyze_regex(pattern)
+    action, priority, branch, regex_issues = _rec_core(
+        pattern, sev_bucket, cancelled > 0, times_bucket
+    )
+
+    recommendations = []
 
     # Regla con cancelaciones — indica timeout del regex
-    if cancelled > 0:
+    if branch == "cancelled":
         pct_cancel = (cancelled / max(times_called, 1)) * 100
-        action = "DESHABILITAR"
-        priority = 1
         recommendations.append(
             f"⛔ <strong>{cancelled:,} cancelaciones</strong> ({pct_cancel:.1f}% de ejecuciones). "
             f"El motor regex está haciendo timeout en esta propiedad — está causando que eventos "
@@ -143,9 +261,7 @@ def get_recommendation(prop):
         )
 
     # Muy costosa con alto volumen
-    elif avg_ns >= THRESHOLDS["critical"] and times_called > 1000:
-        action = "REESCRIBIR"
-        priority = 1
+    elif branch == "critical_volume":
         cpu_per_sec = (avg_ns * REFERENCE_EPS) / 1e9
         recommendations.append(
             f"Con {avg_ms:.3f}ms promedio y {times_called:,} llamadas, esta propiedad consume "
@@ -154,9 +270,7 @@ def get_recommendation(prop):
         )
 
     # Costosa con pocas llamadas (baja frecuencia, pero peso unitario alto)
-    elif avg_ns >= THRESHOLDS["critical"] and times_called < 100:
-        action = "REVISAR"
-        priority = 2
+    elif branch == "critical_low_volume":
         recommendations.append(
             f"Alto costo por evaluación ({avg_ms:.3f}ms) pero pocas llamadas ({times_called}). "
             f"Si el volumen de eventos que coincide aumenta, el impacto será significativo. "
@@ -164,9 +278,7 @@ def get_recommendation(prop):
         )
 
     # Alto costo
-    elif avg_ns >= THRESHOLDS["high"]:
-        action = "OPTIMIZAR"
-        priority = 2
+    elif branch == "high":
         recommendations.append(
             f"Tiempo de evaluación elevado ({avg_ms:.3f}ms promedio). "
             f"Revisar el patrón regex y aplicar las optimizaciones indicadas abajo."
@@ -183,7 +295,7 @@ def get_recommendation(prop):
 
     # Agregar issues de regex
     for level, issue in regex_issues:
-        icon = {"CRÍTICO": "🔴", "ALTO": "🟠", "MEDIO": "🟡", "BAJO": "🔵", "INFO": "ℹ️"}.get(level, "•")
+        icon = _LEVEL_ICONS.get(level, "•")
         recommendations.append(f"{icon} <em>[Regex/{level}]</em> {issue}")
 
     # Sin recomendaciones específicas
@@ -193,10 +305,6 @@ def get_recommendation(prop):
             "experimenta degradación de rendimiento."
         )
 
-    if action == "MONITOREAR" and avg_ns >= THRESHOLDS["medium"]:
-        action = "REVISAR"
-        priority = 3
-
     return {
         "action": action,
         "priority": priority,
@@ -208,52 +316,144 @@ def get_recommendation(prop):
 # ─────────────────────────────────────────────────────────────────────────────
 # PARSER
 # ─────────────────────────────────────────────────────────────────────────────
+_MBEAN_NAME = re.compile(r'name="([^"]+)"')
+
+
+@dataclass(slots=True)
+class Prop:
+    """Métricas de una custom property parseada del .tabular.
+
+    Con __slots__ cada fila es un struct compacto en vez de un dict de ~12
+    claves: menos memoria y acceso a campo por offset en los loops calientes.
+    """
+    name: str
+    mbean: str
+    pattern: str
+    times_called: int
+    cancelled: int
+    avg_ns: float
+    max_ns: float
+    min_ns: float
+    source_file: str
+
+
+def _cell_float(row, i):
+    """Convierte la celda row[i] a float con fallback a 0.0."""
+    if i < 0 or i >= len(row):
+        return 0.0
+    try:
+        return float(row[i] or 0)
+    except ValueError:
+        return 0.0
+
+
+def _cell_int(row, i):
+    """Convierte la celda row[i] a int con fallback a 0."""
+    if i < 0 or i >= len(row):
+        return 0
+    try:
+        return int(float(row[i] or 0))
+    except ValueError:
+        return 0
+
+
+_TABULAR_COLS = (
+    "MBean", "Pattern", "TimesCalled", "TimesCancelled",
+    "AverageNanoSeconds", "LongestMatchNanoSeconds", "ShortestMatchNanoSeconds",
+)
+
+
+def _parse_tabular_pandas(filepath):
+    """Parseo vectorizado con pandas: las conversiones numéricas corren en C."""
+    df = pd.read_csv(
+        filepath, sep="\t",
+        usecols=lambda c: c in _TABULAR_COLS,
+        dtype=str, na_filter=False,
+        encoding="utf-8", encoding_errors="replace",
+        on_bad_lines="skip",
+    )
+    for col in _TABULAR_COLS:
+        if col not in df.columns:
+            df[col] = ""
+
+    def num(col):
+        return pd.to_numeric(df[col], errors="coerce").fillna(0.0)
+
+    times_called = num("TimesCalled").astype(int)
+    cancelled    = num("TimesCancelled").astype(int)
+    avg_ns       = num("AverageNanoSeconds")
+    max_ns       = num("LongestMatchNanoSeconds")
+    min_ns       = num("ShortestMatchNanoSeconds")
+
+    names = df["MBean"].str.extract(_MBEAN_NAME, expand=False).fillna("")
+    names = names.where(names != "", df["MBean"])
+
+    src_name = Path(filepath).name
+    return [
+        Prop(name=n, mbean=mb, pattern=pt, times_called=int(tc), cancelled=int(cc),
+             avg_ns=a, max_ns=mx, min_ns=mn, source_file=src_name)
+        for n, mb, pt, tc, cc, a, mx, mn in zip(
+            names, df["MBean"], df["Pattern"].str.strip(),
+            times_called, cancelled, avg_ns, max_ns, min_ns,
+        )
+    ]
+
+
 def parse_tabular(filepath):
     """Lee el archivo .tabular y extrae métricas."""
+    if pd is not None:
+        try:
+            return _parse_tabular_pandas(filepath)
+        except Exception:
+            pass  # ante cualquier sorpresa de formato, caer al parser stdlib
+
     props = []
 
-    with open(filepath, "r", encoding="utf-8", errors="replace") as f:
-        reader = csv.DictReader(f, delimiter="\t")
+    with open(filepath, "r", encoding="utf-8", errors="replace", newline="") as f:
+        reader = csv.reader(f, delimiter="\t")
+
+        # Resolver índices de columna una sola vez desde el header en vez de
+        # construir un dict por fila (csv.DictReader) y hashear cada clave.
+        header = next(reader, None)
+        if header is None:
+            return props
+        idx = {name: i for i, name in enumerate(header)}
+        i_mbean   = idx.get("MBean", -1)
+        i_pattern = idx.get("Pattern", -1)
+        i_times   = idx.get("TimesCalled", -1)
+        i_cancel  = idx.get("TimesCancelled", -1)
+        i_avg     = idx.get("AverageNanoSeconds", -1)
+        i_max     = idx.get("LongestMatchNanoSeconds", -1)
+        i_min     = idx.get("ShortestMatchNanoSeconds", -1)
+
+        # Un solo Path() por archivo, no uno por fila
+        src_name = Path(filepath).name
 
         for row in reader:
             try:
-                def to_float(key):
-                    val = row.get(key, "0") or "0"
-                    try:
-                        return float(val)
-                    except (ValueError, TypeError):
-                        return 0.0
-
-                def to_int(key):
-                    val = row.get(key, "0") or "0"
-                    try:
-                        return int(float(val))
-                    except (ValueError, TypeError):
-                        return 0
-
-                times_called = to_int("TimesCalled")
-                avg_ns = to_float("AverageNanoSeconds")
+                times_called = _cell_int(row, i_times)
+                avg_ns = _cell_float(row, i_avg)
+                max_ns = _cell_float(row, i_max)
+                min_ns = _cell_float(row, i_min)
 
                 # Extraer nombre desde MBean si es posible
-                mbean = row.get("MBean", "")
-                name = ""
-                if 'name="' in mbean:
-                    name = mbean.split('name="')[1].rstrip('"')
-
-                props.append({
-                    "name":         name or mbean,
-                    "mbean":        mbean,
-                    "pattern":      row.get("Pattern", "").strip(),
-                    "times_called": times_called,
-                    "cancelled":    to_int("TimesCancelled"),
-                    "avg_ns":       avg_ns,
-                    "max_ns":       to_float("LongestMatchNanoSeconds"),
-                    "min_ns":       to_float("ShortestMatchNanoSeconds"),
-                    "avg_ms":       avg_ns / NS_PER_MS,
-                    "max_ms":       to_float("LongestMatchNanoSeconds") / NS_PER_MS,
-                    "min_ms":       to_float("ShortestMatchNanoSeconds") / NS_PER_MS,
-                    "source_file":  Path(filepath).name,
-                })
+                mbean = row[i_mbean] if 0 <= i_mbean < len(row) else ""
+                m = _MBEAN_NAME.search(mbean)
+                name = m.group(1) if m else ""
+
+                pattern = row[i_pattern] if 0 <= i_pattern < len(row) else ""
+
+                props.append(Prop(
+                    name=name or mbean,
+                    mbean=mbean,
+                    pattern=pattern.strip(),
+                    times_called=times_called,
+                    cancelled=_cell_int(row, i_cancel),
+                    avg_ns=avg_ns,
+                    max_ns=max_ns,
+                    min_ns=min_ns,
+                    source_file=src_name,
+                ))
 
             except Exception:
                 continue
@@ -264,94 +464,101 @@ def parse_tabular(filepath):
 # ─────────────────────────────────────────────────────────────────────────────
 # GENERADOR HTML
 # ─────────────────────────────────────────────────────────────────────────────
-def generate_html_report(props_analyzed, source_files, top_n, threshold_ns):
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    threshold_ms = threshold_ns / NS_PER_MS
-
-    critical_count  = sum(1 for p in props_analyzed if p["avg_ns"] >= THRESHOLDS["critical"])
-    high_count      = sum(1 for p in props_analyzed if THRESHOLDS["high"] <= p["avg_ns"] < THRESHOLDS["critical"])
-    medium_count    = sum(1 for p in props_analyzed if THRESHOLDS["medium"] <= p["avg_ns"] < THRESHOLDS["high"])
-    cancelled_count = sum(1 for p in props_analyzed if p["cancelled"] > 0)
-
-    display_props = props_analyzed[:top_n]
-
-    # Top 3 para resumen
-    top3_html = "<br>".join([
-        f"<b>#{i+1}</b> {p['pattern'][:70]}{'...' if len(p['pattern'])>70 else ''} "
-        f"<span style='color:#dc2626'>({p['avg_ms']:.3f}ms avg)</span>"
-        for i, p in enumerate(display_props[:3])
-    ])
-
-    # Generar filas
-    rows_html = ""
-    for i, prop in enumerate(display_props, 1):
-        sev_label, sev_color, sev_icon = classify_severity(prop["avg_ns"])
-        rec = get_recommendation(prop)
-
-        action_colors = {
-            "DESHABILITAR": "#dc2626",
-            "REESCRIBIR":   "#9333ea",
-            "OPTIMIZAR":    "#d97706",
-            "REVISAR":      "#2563eb",
-            "MONITOREAR":   "#16a34a",
-        }
-        action_color = action_colors.get(rec["action"], "#6b7280")
-
-        rec_html = "<ul style='margin:4px 0 0 0; padding-left:16px;'>"
-        for detail in rec["details"]:
-            rec_html += f"<li style='margin-bottom:5px; line-height:1.4;'>{detail}</li>"
-        rec_html += "</ul>"
-
-        cancelled_display = (
-            f'<span style="color:#dc2626; font-weight:700;">{prop["cancelled"]:,}</span>'
-            if prop["cancelled"] > 0
-            else f'<span style="color:#9ca3af">0</span>'
-        )
-
-        bar_pct = min(100, (prop["avg_ns"] / (THRESHOLDS["critical"] * 2)) * 100)
-        pattern_display = prop["pattern"].replace("<", "&lt;").replace(">", "&gt;")
-
-        rows_html += f"""
+# Plantilla de fila definida una sola vez: interpolar un f-string de ~1 KB por
+# iteración re-parsea la expresión en cada vuelta del loop.
+_ROW_TMPL = """
         <tr style="border-bottom:1px solid #e5e7eb;">
             <td style="padding:12px 8px; text-align:center; font-weight:700; color:#6b7280; font-size:13px;">{i}</td>
-            <td style="padding:12px 8px; font-family:monospace; font-size:11px; color:#374151; 
-                       max-width:280px; word-break:break-all;">{pattern_display}</td>
+            <td style="padding:12px 8px; font-family:monospace; font-size:11px; color:#374151;
+                       max-width:280px; word-break:break-all;">{pattern}</td>
             <td style="padding:12px 8px; text-align:center;">
-                <span style="display:inline-block; background:{sev_color}15; color:{sev_color}; 
-                       border:1px solid {sev_color}40; border-radius:4px; 
+                <span style="display:inline-block; background:{sev_color}15; color:{sev_color};
+                       border:1px solid {sev_color}40; border-radius:4px;
                        padding:2px 8px; font-size:11px; font-weight:700;">
                     {sev_icon} {sev_label}
                 </span>
             </td>
             <td style="padding:12px 8px; text-align:right;">
-                <div style="font-weight:700; color:{sev_color}; font-size:15px;">{prop['avg_ms']:.3f}ms</div>
-                <div style="font-size:10px; color:#9ca3af;">{prop['avg_ns']:,.0f} ns</div>
+                <div style="font-weight:700; color:{sev_color}; font-size:15px;">{avg_ms:.3f}ms</div>
+                <div style="font-size:10px; color:#9ca3af;">{avg_ns:,.0f} ns</div>
                 <div style="background:#f3f4f6; border-radius:2px; height:4px; margin-top:4px;">
                     <div style="background:{sev_color}; width:{bar_pct:.0f}%; height:4px; border-radius:2px;"></div>
                 </div>
             </td>
             <td style="padding:12px 8px; text-align:right; font-size:12px; color:#374151;">
-                {prop['max_ms']:.3f}ms<br>
-                <span style="color:#9ca3af; font-size:10px;">{prop['min_ms']:.4f}ms min</span>
+                {max_ms:.3f}ms<br>
+                <span style="color:#9ca3af; font-size:10px;">{min_ms:.4f}ms min</span>
             </td>
-            <td style="padding:12px 8px; text-align:right; color:#374151; font-size:13px;">{prop['times_called']:,}</td>
-            <td style="padding:12px 8px; text-align:center;">{cancelled_display}</td>
-            <td style="padding:12px 8px; font-size:11px; color:#6b7280;">{prop['source_file']}</td>
+            <td style="padding:12px 8px; text-align:right; color:#374151; font-size:13px;">{times_called:,}</td>
+            <td style="padding:12px 8px; text-align:center;">{cancelled}</td>
+            <td style="padding:12px 8px; font-size:11px; color:#6b7280;">{source_file}</td>
             <td style="padding:12px 8px; text-align:center;">
-                <span style="display:inline-block; background:{action_color}15; color:{action_color}; 
-                       border:1px solid {action_color}40; border-radius:4px; 
+                <span style="display:inline-block; background:{action_color}15; color:{action_color};
+                       border:1px solid {action_color}40; border-radius:4px;
                        padding:2px 8px; font-size:11px; font-weight:700;">
-                    {rec['action']}
+                    {action}
                 </span>
             </td>
             <td style="padding:12px 8px; font-size:12px; color:#374151; min-width:300px; max-width:420px;">
-                {rec_html}
+                {rec}
             </td>
         </tr>"""
 
+
+def _summary_counts(props):
+    """Cuenta propiedades por tier de severidad y con cancelaciones (1 pasada)."""
+    if np is not None and props:
+        n = len(props)
+        avg  = np.fromiter((p.avg_ns for p in props), dtype=np.float64, count=n)
+        canc = np.fromiter((p.cancelled for p in props), dtype=np.int64, count=n)
+        return (
+            int((avg >= THRESHOLDS["critical"]).sum()),
+            int(((avg >= THRESHOLDS["high"]) & (avg < THRESHOLDS["critical"])).sum()),
+            int(((avg >= THRESHOLDS["medium"]) & (avg < THRESHOLDS["high"])).sum()),
+            int((canc > 0).sum()),
+        )
+
+    critical = high = medium = cancelled = 0
+    for p in props:
+        avg_ns = p.avg_ns
+        if avg_ns >= THRESHOLDS["critical"]:
+            critical += 1
+        elif avg_ns >= THRESHOLDS["high"]:
+            high += 1
+        elif avg_ns >= THRESHOLDS["medium"]:
+            medium += 1
+        if p.cancelled > 0:
+            cancelled += 1
+    return critical, high, medium, cancelled
+
+
+def stream_html_report(props_analyzed, source_files, top_n, threshold_ns):
+    """
+    Genera el reporte HTML como chunks (header, fila a fila, footer).
+
+    Evita materializar el documento completo en memoria: con --top grande el
+    string final puede ser de decenas de MB; el consumidor escribe cada chunk
+    a medida que se produce (f.writelines).
+    """
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    threshold_ms = threshold_ns / NS_PER_MS
+
+    critical_count, high_count, medium_count, cancelled_count = _summary_counts(props_analyzed)
+
+    display_props = props_analyzed[:top_n]
+
+    # Top 3 para resumen
+    top3_parts = []
+    for i, p in enumerate(display_props[:3]):
+        top3_parts.append(
+            f"<b>#{i+1}</b> {p.pattern[:70]}{'...' if len(p.pattern)>70 else ''} "
+            f"<span style='color:#dc2626'>({p.avg_ns / NS_PER_MS:.3f}ms avg)</span>"
+        )
+    top3_html = "<br>".join(top3_parts)
+
     source_label = ", ".join(source_files)
 
-    html = f"""<!DOCTYPE html>
+    yield f"""<!DOCTYPE html>
 <html lang="es">
 <head>
     <meta charset="UTF-8">
@@ -368,10 +575,10 @@ def generate_html_report(props_analyzed, source_files, top_n, threshold_ns):
         .card {{ background:white; border-radius:8px; padding:20px; box-shadow:0 1px 3px rgba(0,0,0,0.1); }}
         .card .value {{ font-size:32px; font-weight:700; margin-bottom:4px; }}
         .card .label {{ font-size:13px; color:#6b7280; }}
-        table {{ width:100%; border-collapse:collapse; background:white; border-radius:8px; 
+        table {{ width:100%; border-collapse:collapse; background:white; border-radius:8px;
                  box-shadow:0 1px 3px rgba(0,0,0,0.1); overflow:hidden; }}
         thead tr {{ background:#1e1b4b; color:white; }}
-        thead th {{ padding:12px 8px; text-align:left; font-size:11px; font-weight:600; 
+        thead th {{ padding:12px 8px; text-align:left; font-size:11px; font-weight:600;
                     text-transform:uppercase; letter-spacing:0.05em; white-space:nowrap; }}
         tbody tr:hover {{ background:#f9fafb; }}
         .legend {{ display:flex; gap:16px; margin-bottom:16px; flex-wrap:wrap; align-items:center; }}
@@ -422,11 +629,11 @@ def generate_html_report(props_analyzed, source_files, top_n, threshold_ns):
         <div style="font-size:13px; color:#374151; line-height:1.7;">
             {'<div style="background:#fef2f2; border:1px solid #fecaca; border-radius:6px; padding:10px; margin-bottom:12px; color:#dc2626;"><strong>⛔ ALERTA CRÍTICA:</strong> Se detectaron ' + str(cancelled_count) + ' custom propert' + ('ies' if cancelled_count != 1 else 'y') + ' con cancelaciones (TimesCancelled &gt; 0). Esto indica que el motor regex está haciendo timeout, lo que causa que eventos sean enrutados directamente a storage sin pasar por el CRE. Deshabilitar inmediatamente.</div>' if cancelled_count > 0 else ''}
             Se analizaron <strong>{len(props_analyzed):,} custom properties</strong>.
-            Se identificaron <strong style="color:#dc2626;">{critical_count} propiedades críticas</strong> con tiempo de evaluación 
+            Se identificaron <strong style="color:#dc2626;">{critical_count} propiedades críticas</strong> con tiempo de evaluación
             superior a 0.5ms que impactan directamente el rendimiento del pipeline de eventos.
             <br><br>
             <strong>Top 3 propiedades más costosas:</strong><br>
-            <div style="margin-top:8px; font-family:monospace; font-size:11px; background:#f3f4f6; 
+            <div style="margin-top:8px; font-family:monospace; font-size:11px; background:#f3f4f6;
                         padding:10px; border-radius:4px; line-height:1.8; word-break:break-all;">
                 {top3_html}
             </div>
@@ -460,7 +667,66 @@ def generate_html_report(props_analyzed, source_files, top_n, threshold_ns):
                 </tr>
             </thead>
             <tbody>
-                {rows_html}
+"""
+
+    # Clasificación de severidad y barras de calor en lote: una sola pasada
+    # searchsorted/minimum en C en vez de N llamadas Python en el loop de filas.
+    if np is not None and display_props:
+        _avgs = np.fromiter((p.avg_ns for p in display_props),
+                            dtype=np.float64, count=len(display_props))
+        _sev_idx = np.searchsorted(_SEV_THRESHOLDS_ARR, _avgs, side="right")
+        _bar_pcts = np.minimum(100.0, _avgs / (THRESHOLDS["critical"] * 2) * 100.0)
+    else:
+        _sev_idx = _bar_pcts = None
+
+    for i, prop in enumerate(display_props, 1):
+        if _sev_idx is not None:
+            sev_label, sev_color, sev_icon = _SEV_TABLE[_sev_idx[i - 1]]
+        else:
+            sev_label, sev_color, sev_icon = classify_severity(prop.avg_ns)
+        rec = get_recommendation(prop)
+
+        action_color = _ACTION_COLORS.get(rec["action"], "#6b7280")
+
+        rec_html = "<ul style='margin:4px 0 0 0; padding-left:16px;'>"
+        for detail in rec["details"]:
+            rec_html += f"<li style='margin-bottom:5px; line-height:1.4;'>{detail}</li>"
+        rec_html += "</ul>"
+
+        cancelled_display = (
+            f'<span style="color:#dc2626; font-weight:700;">{prop.cancelled:,}</span>'
+            if prop.cancelled > 0
+            else f'<span style="color:#9ca3af">0</span>'
+        )
+
+        if _bar_pcts is not None:
+            bar_pct = float(_bar_pcts[i - 1])
+        else:
+            bar_pct = min(100, (prop.avg_ns / (THRESHOLDS["critical"] * 2)) * 100)
+        pattern_display = escape(prop.pattern)
+
+        # format_map sobre un dict evita el re-empaquetado de kwargs de
+        # .format(**...) en cada fila
+        yield _ROW_TMPL.format_map({
+            "i":            i,
+            "pattern":      pattern_display,
+            "sev_color":    sev_color,
+            "sev_icon":     sev_icon,
+            "sev_label":    sev_label,
+            "avg_ms":       prop.avg_ns / NS_PER_MS,
+            "avg_ns":       prop.avg_ns,
+            "bar_pct":      bar_pct,
+            "max_ms":       prop.max_ns / NS_PER_MS,
+            "min_ms":       prop.min_ns / NS_PER_MS,
+            "times_called": prop.times_called,
+            "cancelled":    cancelled_display,
+            "source_file":  prop.source_file,
+            "action_color": action_color,
+            "action":       rec["action"],
+            "rec":          rec_html,
+        })
+
+    yield f"""
             </tbody>
         </table>
     </div>
@@ -532,8 +798,6 @@ def generate_html_report(props_analyzed, source_files, top_n, threshold_ns):
 </body>
 </html>"""
 
-    return html
-
 
 # ─────────────────────────────────────────────────────────────────────────────
 # MAIN
@@ -551,43 +815,71 @@ def main():
     all_props = []
     threshold_ns = args.threshold_ms * NS_PER_MS
 
+    existing = []
     for filepath in args.input_files:
         if not os.path.exists(filepath):
             print(f"[ERROR] No se encontró: {filepath}", file=sys.stderr)
             continue
-        print(f"[INFO] Procesando: {filepath}")
-        props = parse_tabular(filepath)
-        print(f"       → {len(props):,} propiedades parseadas")
-        all_props.extend(props)
+        existing.append(filepath)
+
+    if len(existing) > 1:
+        # Con varios archivos (CustomProperties-*.tabular) el parseo es
+        # CPU-bound e independiente por archivo: repartirlo entre procesos.
+        with ProcessPoolExecutor() as pool:
+            for filepath, props in zip(existing, pool.map(parse_tabular, existing)):
+                print(f"[INFO] Procesando: {filepath}")
+                print(f"       → {len(props):,} propiedades parseadas")
+                all_props.extend(props)
+    else:
+        for filepath in existing:
+            print(f"[INFO] Procesando: {filepath}")
+            props = parse_tabular(filepath)
+            print(f"       → {len(props):,} propiedades parseadas")
+            all_props.extend(props)
 
     if not all_props:
         print("[ERROR] No se pudieron parsear propiedades.", file=sys.stderr)
         sys.exit(1)
 
-    # Filtrar y ordenar
-    filtered = [p for p in all_props if p["avg_ns"] >= threshold_ns]
-    # Canceladas siempre al tope independientemente del tiempo
-    cancelled = [p for p in all_props if p["cancelled"] > 0 and p not in filtered]
-    filtered = cancelled + filtered
-    filtered.sort(key=lambda p: (-(p["cancelled"] > 0), -p["avg_ns"]))
+    # Filtrar y ordenar. Con numpy, las fases que solo tocan columnas numéricas
+    # (umbral, canceladas, orden) corren como SoA sobre dos arrays contiguos y
+    # la lista de objetos solo se indexa para las filas que sobreviven.
+    if np is not None and all_props:
+        n = len(all_props)
+        avg  = np.fromiter((p.avg_ns for p in all_props), np.float64, n)
+        canc = np.fromiter((p.cancelled for p in all_props), np.int64, n)
+        has_cancel = canc > 0
+        # lexsort: la última clave es la primaria → canceladas primero,
+        # después avg_ns descendente
+        order = np.lexsort((-avg, ~has_cancel))
+        mask = (avg >= threshold_ns) | has_cancel
+        filtered = [all_props[i] for i in order[mask[order]]]
+    else:
+        filtered = [p for p in all_props if p.avg_ns >= threshold_ns]
+        # Canceladas siempre al tope independientemente del tiempo.
+        # Membership por id() en un set: `p not in filtered` sobre la lista era
+        # O(N·M) con comparación de registros completos en cada sondeo.
+        filtered_ids = {id(p) for p in filtered}
+        cancelled = [p for p in all_props if p.cancelled > 0 and id(p) not in filtered_ids]
+        filtered = cancelled + filtered
+        filtered.sort(key=lambda p: (-(p.cancelled > 0), -p.avg_ns))
 
     print(f"[INFO] Propiedades sobre umbral {args.threshold_ms}ms: {len(filtered):,} de {len(all_props):,}")
-    print(f"[INFO] Con cancelaciones (CRE bypass): {sum(1 for p in all_props if p['cancelled'] > 0)}")
-
-    # Generar reporte
-    html = generate_html_report(filtered, args.input_files, args.top, threshold_ns)
+    print(f"[INFO] Con cancelaciones (CRE bypass): {sum(1 for p in all_props if p.cancelled > 0)}")
 
+    # Generar reporte en streaming: cada chunk se escribe a medida que se
+    # produce, sin materializar el documento completo en memoria.
     ts = datetime.now().strftime("%Y%m%d-%H%M%S")
     out_path = args.output or f"qradar_expensive_properties_{ts}.html"
 
     with open(out_path, "w", encoding="utf-8") as f:
-        f.write(html)
+        f.writelines(stream_html_report(filtered, args.input_files, args.top, threshold_ns))
 
     print(f"[OK] Reporte generado: {out_path}")
-    print(f"     → Críticas  (>0.5ms): {sum(1 for p in filtered if p['avg_ns'] >= THRESHOLDS['critical'])}")
-    print(f"     → Altas    (>0.2ms): {sum(1 for p in filtered if THRESHOLDS['high'] <= p['avg_ns'] < THRESHOLDS['critical'])}")
-    print(f"     → Medias  (>0.05ms): {sum(1 for p in filtered if THRESHOLDS['medium'] <= p['avg_ns'] < THRESHOLDS['high'])}")
-    print(f"     → Con cancelaciones: {sum(1 for p in filtered if p['cancelled'] > 0)}")
+    print(f"     → Críticas  (>0.5ms): {sum(1 for p in filtered if p.avg_ns >= THRESHOLDS['critical'])}")
+    print(f"     → Altas    (>0.2ms): {sum(1 for p in filtered if THRESHOLDS['high'] <= p.avg_ns < THRESHOLDS['critical'])}")
+    print(f"     → Medias  (>0.05ms): {sum(1 for p in filtered if THRESHOLDS['medium'] <= p.avg_ns < THRESHOLDS['high'])}")
+    print(f"     → Con cancelaciones: {sum(1 for p in filtered if p.cancelled > 0)}")
 
 
 if __name__ == "__main__":
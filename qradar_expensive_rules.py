@@ -28,12 +28,28 @@ Ejemplo:
 """
 
 import csv
+import heapq
+import re
 import sys
 import os
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 
+# pandas es opcional: acelera el parseo en archivos grandes, pero el script
+# debe seguir funcionando con el Python pelado de una consola QRadar.
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # CONFIGURACIÓN DE UMBRALES (en segundos, igual que el archivo)
@@ -45,8 +61,22 @@ THRESHOLDS = {
     "low":       0.010,   # > 10ms   → BAJO: aceptable pero a observar
 }
 
+# Umbrales en ms, precalculados una vez: evita repetir THRESHOLDS[...] * 1000
+# en cada clasificación / recomendación por regla
+CRIT_MS = THRESHOLDS["critical"] * 1000
+HIGH_MS = THRESHOLDS["high"] * 1000
+MED_MS  = THRESHOLDS["medium"] * 1000
+LOW_MS  = THRESHOLDS["low"] * 1000
+
 FIRED_COUNT_MIN = 0  # Incluir reglas aunque nunca hayan disparado (pueden ser costosas igual)
 
+# Extracción del folder desde el string MBean, compilada una sola vez
+_FOLDER_RE = re.compile(r"folder=([^,]*)")
+
+# Algunas reglas traen MBeans/nombres larguísimos; el límite por defecto de
+# csv (128 KB por campo) aborta el parseo con "field larger than field limit"
+csv.field_size_limit(10 * 1024 * 1024)
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # LÓGICA DE RECOMENDACIÓN
@@ -56,22 +86,21 @@ def get_recommendation(rule):
     Genera recomendación específica basada en el perfil de la regla.
     Combina tiempo de evaluación, frecuencia de disparo y tipo de regla.
     """
-    avg_ms   = rule["avg_test_ms"]
-    max_ms   = rule["max_test_ms"]
-    alltime_max_ms = rule["alltime_max_ms"]
-    fired    = rule["fired_count"]
-    tested   = rule["total_test_count"]
-    name     = rule["name"]
-    folder   = rule["folder"]
-    rule_id  = rule["id"]
-    cap_eps  = rule["capacity_eps"]
+    avg_ms   = rule.avg_test_ms
+    max_ms   = rule.max_test_ms
+    fired    = rule.fired_count
+    tested   = rule.total_test_count
+    name     = rule.name
+    folder   = rule.folder
+    rule_id  = rule.id
+    cap_eps  = rule.capacity_eps
 
     recommendations = []
     action = "MONITOREAR"
     priority = 4
 
     # ── Regla muy costosa y nunca dispara ──────────────────────────────────
-    if avg_ms > THRESHOLDS["critical"] * 1000 and fired == 0 and tested > 500:
+    if avg_ms > CRIT_MS and fired == 0 and tested > 500:
         action = "DESHABILITAR"
         priority = 1
         recommendations.append(
@@ -81,7 +110,7 @@ def get_recommendation(rule):
         )
 
     # ── Regla crítica con alto volumen ────────────────────────────────────
-    elif avg_ms > THRESHOLDS["critical"] * 1000 and tested > 1000:
+    elif avg_ms > CRIT_MS and tested > 1000:
         action = "REESCRIBIR"
         priority = 1
         recommendations.append(
@@ -93,7 +122,7 @@ def get_recommendation(rule):
 
     # ── Regla de BB (Building Block) costosa ──────────────────────────────
     elif "BB" in name or "BB" in folder:
-        if avg_ms > THRESHOLDS["medium"] * 1000:
+        if avg_ms > MED_MS:
             action = "OPTIMIZAR BB"
             priority = 2
             recommendations.append(
@@ -103,10 +132,10 @@ def get_recommendation(rule):
             )
 
     # ── Regla con picos extremos (max >> avg) ─────────────────────────────
-    if alltime_max_ms > avg_ms * 10 and alltime_max_ms > THRESHOLDS["high"] * 1000:
+    if max_ms > avg_ms * 10 and max_ms > HIGH_MS:
         recommendations.append(
-            f"Pico histórico de {alltime_max_ms:.0f}ms vs promedio de {avg_ms:.1f}ms "
-            f"(ratio {alltime_max_ms/max(avg_ms,0.001):.0f}x). "
+            f"Pico histórico de {max_ms:.0f}ms vs promedio de {avg_ms:.1f}ms "
+            f"(ratio {max_ms/max(avg_ms,0.001):.0f}x). "
             f"Indica comportamiento inestable ante ciertos eventos — revisar condiciones "
             f"con expresiones regulares o lookups costosos que se activan esporádicamente."
         )
@@ -119,7 +148,7 @@ def get_recommendation(rule):
         )
 
     # ── Regla de alta frecuencia con tiempo medio-alto ────────────────────
-    if tested > 2000 and avg_ms > THRESHOLDS["medium"] * 1000:
+    if tested > 2000 and avg_ms > MED_MS:
         if action == "MONITOREAR":
             action = "OPTIMIZAR"
             priority = 2
@@ -138,7 +167,7 @@ def get_recommendation(rule):
 
     # ── Sin recomendaciones específicas ───────────────────────────────────
     if not recommendations:
-        if avg_ms > THRESHOLDS["medium"] * 1000:
+        if avg_ms > MED_MS:
             recommendations.append(
                 "Tiempo de evaluación elevado. Revisar condiciones de la regla y "
                 "asegurarse de que las más selectivas estén primero en la cadena de evaluación."
@@ -150,7 +179,7 @@ def get_recommendation(rule):
             )
 
     # Determinar acción si aún es MONITOREAR pero tiene tiempo alto
-    if action == "MONITOREAR" and avg_ms > THRESHOLDS["high"] * 1000:
+    if action == "MONITOREAR" and avg_ms > HIGH_MS:
         action = "REVISAR"
         priority = 3
 
@@ -165,69 +194,174 @@ def get_recommendation(rule):
 # ─────────────────────────────────────────────────────────────────────────────
 # PARSER DEL ARCHIVO TSV
 # ─────────────────────────────────────────────────────────────────────────────
+@dataclass(slots=True)
+class Rule:
+    """Métricas de una regla parseada del TSV de CustomRule.
+
+    Con __slots__ cada fila es un struct compacto en vez de un dict de ~14
+    claves: menos memoria y acceso a campo por offset en los loops calientes.
+    """
+    name: str
+    folder: str
+    id: str
+    avg_test_ms: float
+    max_test_ms: float
+    current_max_ms: float
+    fired_count: int
+    total_test_count: int
+    total_test_time_s: float
+    capacity_eps: float
+    alltime_cap_eps: float
+    response_count: int
+    max_test_timestamp: str
+    mbean: str
+
+
+def _cell(row, i):
+    """Devuelve la celda row[i] o cadena vacía si la fila es corta."""
+    return row[i] if 0 <= i < len(row) else ""
+
+
+def _cell_float(row, i):
+    """Convierte la celda row[i] a float con fallback a 0.0."""
+    try:
+        return float(_cell(row, i) or 0)
+    except ValueError:
+        return 0.0
+
+
+def _cell_int(row, i):
+    """Convierte la celda row[i] a int con fallback a 0."""
+    try:
+        return int(float(_cell(row, i) or 0))
+    except ValueError:
+        return 0
+
+
+_TSV_COLS = (
+    "Name", "Id", "MBean",
+    "AllTimeAverageTestTime", "AllTimeMaximumTestTime", "MaximumTestTime",
+    "TotalTestCount", "FiredCount", "TotalTestTime",
+    "CapacityEps", "AllTimeCapacityEps", "TotalResponseCount",
+    "AllTimeMaximumTestTimeTimestamp",
+)
+
+
+def _parse_tsv_pandas(filepath):
+    """Parseo vectorizado con pandas: las conversiones numéricas corren en C."""
+    df = pd.read_csv(
+        filepath, sep="\t",
+        usecols=lambda c: c in _TSV_COLS,
+        dtype=str, na_filter=False,
+        encoding="utf-8", encoding_errors="replace",
+        on_bad_lines="skip",
+    )
+    for col in _TSV_COLS:
+        if col not in df.columns:
+            df[col] = ""
+
+    def num(col):
+        return pd.to_numeric(df[col], errors="coerce").fillna(0.0)
+
+    # Filtrar filas nunca evaluadas, igual que el parser stdlib
+    keep = (num("TotalTestCount") > 0) | (num("AllTimeAverageTestTime") > 0)
+    df = df[keep]
+
+    folders = df["MBean"].str.extract(_FOLDER_RE, expand=False).fillna("")
+
+    return [
+        Rule(
+            name=n, folder=fo, id=rid,
+            avg_test_ms=a, max_test_ms=mx, current_max_ms=cm,
+            fired_count=int(fc), total_test_count=int(tc),
+            total_test_time_s=ttt, capacity_eps=ce, alltime_cap_eps=ace,
+            response_count=int(rc), max_test_timestamp=mts, mbean=mb,
+        )
+        for n, fo, rid, a, mx, cm, fc, tc, ttt, ce, ace, rc, mts, mb in zip(
+            df["Name"].str.strip(), folders, df["Id"].str.strip(),
+            num("AllTimeAverageTestTime") * 1000.0,
+            num("AllTimeMaximumTestTime") * 1000.0,
+            num("MaximumTestTime") * 1000.0,
+            num("FiredCount").astype(int), num("TotalTestCount").astype(int),
+            num("TotalTestTime"), num("CapacityEps"), num("AllTimeCapacityEps"),
+            num("TotalResponseCount").astype(int),
+            df["AllTimeMaximumTestTimeTimestamp"], df["MBean"],
+        )
+    ]
+
+
 def parse_tsv(filepath):
     """Lee el archivo CustomRule TSV y extrae métricas relevantes."""
-    rules = []
+    if pd is not None:
+        try:
+            return _parse_tsv_pandas(filepath)
+        except Exception:
+            pass  # ante cualquier sorpresa de formato, caer al parser stdlib
 
-    with open(filepath, "r", encoding="utf-8", errors="replace") as f:
-        reader = csv.DictReader(f, delimiter="\t")
+    rules = []
 
+    # Buffer de 1 MiB: menos syscalls de lectura sobre exports de varios MB
+    with open(filepath, "r", encoding="utf-8", errors="replace", newline="",
+              buffering=1 << 20) as f:
+        reader = csv.reader(f, delimiter="\t")
+
+        # Resolver los índices de columna una sola vez desde el header:
+        # csv.DictReader construía un dict por fila y hasheaba cada clave.
+        header = next(reader, None)
+        if header is None:
+            return rules
+        idx = {name: i for i, name in enumerate(header)}
+        i_name   = idx.get("Name", -1)
+        i_id     = idx.get("Id", -1)
+        i_mbean  = idx.get("MBean", -1)
+        i_avg    = idx.get("AllTimeAverageTestTime", -1)
+        i_max    = idx.get("AllTimeMaximumTestTime", -1)
+        i_cur    = idx.get("MaximumTestTime", -1)
+        i_tested = idx.get("TotalTestCount", -1)
+        i_fired  = idx.get("FiredCount", -1)
+        i_ttt    = idx.get("TotalTestTime", -1)
+        i_cap    = idx.get("CapacityEps", -1)
+        i_acap   = idx.get("AllTimeCapacityEps", -1)
+        i_resp   = idx.get("TotalResponseCount", -1)
+        i_ts     = idx.get("AllTimeMaximumTestTimeTimestamp", -1)
+
+        # Sin try/except por fila: _cell tolera filas cortas y los helpers
+        # numéricos ya hacen fallback a 0 ante valores malformados. El blanket
+        # `except Exception` anterior escondía bugs reales del parser.
         for row in reader:
-            try:
-                # Extraer folder desde el MBean string
-                mbean = row.get("MBean", "")
-                folder = ""
-                if "folder=" in mbean:
-                    folder = mbean.split("folder=")[1].split(",")[0]
-
-                # Convertir a float con fallback a 0
-                def to_float(key):
-                    val = row.get(key, "0") or "0"
-                    try:
-                        return float(val)
-                    except (ValueError, TypeError):
-                        return 0.0
-
-                def to_int(key):
-                    val = row.get(key, "0") or "0"
-                    try:
-                        return int(float(val))
-                    except (ValueError, TypeError):
-                        return 0
-
-                # Convertir tiempos de segundos a milisegundos
-                avg_test_s      = to_float("AllTimeAverageTestTime")
-                max_test_s      = to_float("AllTimeMaximumTestTime")
-                current_max_s   = to_float("MaximumTestTime")
-                avg_test_ms     = avg_test_s * 1000
-                max_test_ms     = max_test_s * 1000
-
-                # Filtrar filas con tiempo 0 (nunca evaluadas)
-                total_test = to_int("TotalTestCount")
-                if total_test == 0 and avg_test_ms == 0:
-                    continue
-
-                rule = {
-                    "name":            row.get("Name", "").strip(),
-                    "folder":          folder,
-                    "id":              row.get("Id", "").strip(),
-                    "avg_test_ms":     avg_test_ms,
-                    "max_test_ms":     max_test_ms,
-                    "current_max_ms":  current_max_s * 1000,
-                    "alltime_max_ms":  max_test_ms,
-                    "fired_count":     to_int("FiredCount"),
-                    "total_test_count": total_test,
-                    "total_test_time_s": to_float("TotalTestTime"),
-                    "capacity_eps":    to_float("CapacityEps"),
-                    "alltime_cap_eps": to_float("AllTimeCapacityEps"),
-                    "response_count":  to_int("TotalResponseCount"),
-                    "max_test_timestamp": row.get("AllTimeMaximumTestTimeTimestamp", ""),
-                    "mbean":           mbean,
-                }
-                rules.append(rule)
-
-            except Exception as e:
-                continue  # Saltar filas malformadas
+            # Extraer folder desde el MBean string
+            mbean = _cell(row, i_mbean)
+            m = _FOLDER_RE.search(mbean)
+            folder = m.group(1) if m else ""
+
+            # Convertir tiempos de segundos a milisegundos
+            avg_test_s      = _cell_float(row, i_avg)
+            max_test_s      = _cell_float(row, i_max)
+            current_max_s   = _cell_float(row, i_cur)
+            avg_test_ms     = avg_test_s * 1000
+            max_test_ms     = max_test_s * 1000
+
+            # Filtrar filas con tiempo 0 (nunca evaluadas)
+            total_test = _cell_int(row, i_tested)
+            if total_test == 0 and avg_test_ms == 0:
+                continue
+
+            rules.append(Rule(
+                name=_cell(row, i_name).strip(),
+                folder=folder,
+                id=_cell(row, i_id).strip(),
+                avg_test_ms=avg_test_ms,
+                max_test_ms=max_test_ms,
+                current_max_ms=current_max_s * 1000,
+                fired_count=_cell_int(row, i_fired),
+                total_test_count=total_test,
+                total_test_time_s=_cell_float(row, i_ttt),
+                capacity_eps=_cell_float(row, i_cap),
+                alltime_cap_eps=_cell_float(row, i_acap),
+                response_count=_cell_int(row, i_resp),
+                max_test_timestamp=_cell(row, i_ts),
+                mbean=mbean,
+            ))
 
     return rules
 
@@ -236,108 +370,154 @@ def parse_tsv(filepath):
 # CLASIFICACIÓN DE SEVERIDAD
 # ─────────────────────────────────────────────────────────────────────────────
 def classify_severity(avg_ms):
-    if avg_ms >= THRESHOLDS["critical"] * 1000:
+    if avg_ms >= CRIT_MS:
         return "CRÍTICO", "#dc2626", "🔴"
-    elif avg_ms >= THRESHOLDS["high"] * 1000:
+    elif avg_ms >= HIGH_MS:
         return "ALTO", "#ea580c", "🟠"
-    elif avg_ms >= THRESHOLDS["medium"] * 1000:
+    elif avg_ms >= MED_MS:
         return "MEDIO", "#ca8a04", "🟡"
     else:
         return "BAJO", "#16a34a", "🟢"
 
 
-# ─────────────────────────────────────────────────────────────────────────────
-# GENERADOR DE REPORTE HTML
-# ─────────────────────────────────────────────────────────────────────────────
-def generate_html_report(rules_analyzed, source_file, top_n, threshold_ms):
-    """Genera el reporte HTML completo."""
-
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    ep_name = Path(source_file).stem
-    total_rules_in_file = len(rules_analyzed) + 0  # ajustar si se filtró
-    critical_count = sum(1 for r in rules_analyzed if r["avg_test_ms"] >= THRESHOLDS["critical"] * 1000)
-    high_count     = sum(1 for r in rules_analyzed if THRESHOLDS["high"] * 1000 <= r["avg_test_ms"] < THRESHOLDS["critical"] * 1000)
-    medium_count   = sum(1 for r in rules_analyzed if THRESHOLDS["medium"] * 1000 <= r["avg_test_ms"] < THRESHOLDS["high"] * 1000)
-
-    # Calcular CPU total acumulada por todas las reglas
-    total_cpu_s = sum(r["total_test_time_s"] for r in rules_analyzed)
+# Cortes de severidad en ms, ordenados: código 0=BAJO, 1=MEDIO, 2=ALTO, 3=CRÍTICO
+_SEV_EDGES_MS = (
+    MED_MS,
+    HIGH_MS,
+    CRIT_MS,
+)
+
+# (label, color, icono) indexada por el código de severidad de searchsorted
+_SEV_TABLE = (
+    ("BAJO",    "#16a34a", "🟢"),
+    ("MEDIO",   "#ca8a04", "🟡"),
+    ("ALTO",    "#ea580c", "🟠"),
+    ("CRÍTICO", "#dc2626", "🔴"),
+)
+
+# Paleta de colores por acción recomendada
+ACTION_COLORS = {
+    "DESHABILITAR": "#dc2626",
+    "REESCRIBIR":   "#9333ea",
+    "OPTIMIZAR BB": "#ea580c",
+    "OPTIMIZAR":    "#d97706",
+    "REVISAR":      "#2563eb",
+    "MONITOREAR":   "#16a34a",
+}
 
-    # Top N para mostrar
-    display_rules = rules_analyzed[:top_n]
 
-    # Generar filas de la tabla
-    rows_html = ""
-    for i, rule in enumerate(display_rules, 1):
-        sev_label, sev_color, sev_icon = classify_severity(rule["avg_test_ms"])
-        rec = get_recommendation(rule)
+def _badge(color, text):
+    """Badge <span> con la indentación exacta de la celda de la tabla."""
+    return (
+        f'<span style="display:inline-block; background:{color}15; color:{color}; \n'
+        f'                       border:1px solid {color}40; border-radius:4px; \n'
+        f'                       padding:2px 8px; font-size:11px; font-weight:700;">\n'
+        f'                    {text}\n'
+        f'                </span>'
+    )
 
-        action_colors = {
-            "DESHABILITAR": "#dc2626",
-            "REESCRIBIR":   "#9333ea",
-            "OPTIMIZAR BB": "#ea580c",
-            "OPTIMIZAR":    "#d97706",
-            "REVISAR":      "#2563eb",
-            "MONITOREAR":   "#16a34a",
-        }
-        action_color = action_colors.get(rec["action"], "#6b7280")
-
-        rec_html = "<ul style='margin:4px 0 0 0; padding-left:18px;'>"
-        for detail in rec["details"]:
-            rec_html += f"<li style='margin-bottom:4px;'>{detail}</li>"
-        rec_html += "</ul>"
-
-        fired_display = f"{rule['fired_count']:,}" if rule['fired_count'] > 0 else '<span style="color:#9ca3af">0</span>'
-        cpu_total = rule['total_test_time_s']
-        cpu_display = f"{cpu_total:.2f}s" if cpu_total < 60 else f"{cpu_total/60:.1f}min"
 
-        # Barra de calor para avg_test_ms
-        bar_pct = min(100, (rule["avg_test_ms"] / (THRESHOLDS["critical"] * 1000 * 2)) * 100)
-        bar_color = sev_color
+# Los badges solo dependen del tier / acción (conjuntos pequeños y fijos),
+# así que el HTML se construye una única vez por valor posible
+SEV_BADGE_HTML = {
+    label: _badge(color, f"{icon} {label}")
+    for label, color, icon in (
+        ("CRÍTICO", "#dc2626", "🔴"),
+        ("ALTO",    "#ea580c", "🟠"),
+        ("MEDIO",   "#ca8a04", "🟡"),
+        ("BAJO",    "#16a34a", "🟢"),
+    )
+}
+ACTION_BADGE_HTML = {action: _badge(color, action) for action, color in ACTION_COLORS.items()}
 
-        rows_html += f"""
+# Plantilla de fila definida una sola vez: interpolar un f-string de ~1 KB por
+# iteración re-parsea la expresión en cada vuelta del loop.
+_ROW_TMPL = """
         <tr style="border-bottom: 1px solid #e5e7eb;">
             <td style="padding:12px 8px; text-align:center; font-weight:700; color:#6b7280; font-size:13px;">#{i}</td>
             <td style="padding:12px 8px;">
-                <div style="font-weight:600; color:#111827; font-size:13px; margin-bottom:2px;">{rule['name']}</div>
-                <div style="font-size:11px; color:#6b7280;">{rule['folder']}</div>
-                {'<div style="font-size:11px; color:#9ca3af;">ID: ' + rule['id'] + '</div>' if rule['id'] else ''}
+                <div style="font-weight:600; color:#111827; font-size:13px; margin-bottom:2px;">{name}</div>
+                <div style="font-size:11px; color:#6b7280;">{folder}</div>
+                {id_div}
             </td>
             <td style="padding:12px 8px; text-align:center;">
-                <span style="display:inline-block; background:{sev_color}15; color:{sev_color}; 
-                       border:1px solid {sev_color}40; border-radius:4px; 
-                       padding:2px 8px; font-size:11px; font-weight:700;">
-                    {sev_icon} {sev_label}
-                </span>
+                {sev_badge}
             </td>
             <td style="padding:12px 8px; text-align:right;">
-                <div style="font-weight:700; color:{sev_color}; font-size:15px;">{rule['avg_test_ms']:.1f}ms</div>
+                <div style="font-weight:700; color:{sev_color}; font-size:15px;">{avg_ms:.1f}ms</div>
                 <div style="background:#f3f4f6; border-radius:2px; height:4px; margin-top:4px;">
-                    <div style="background:{bar_color}; width:{bar_pct:.0f}%; height:4px; border-radius:2px;"></div>
+                    <div style="background:{sev_color}; width:{bar_pct:.0f}%; height:4px; border-radius:2px;"></div>
                 </div>
             </td>
-            <td style="padding:12px 8px; text-align:right; color:#374151; font-size:13px;">{rule['max_test_ms']:.1f}ms</td>
-            <td style="padding:12px 8px; text-align:right; color:#374151; font-size:13px;">{rule['total_test_count']:,}</td>
+            <td style="padding:12px 8px; text-align:right; color:#374151; font-size:13px;">{max_ms:.1f}ms</td>
+            <td style="padding:12px 8px; text-align:right; color:#374151; font-size:13px;">{tested:,}</td>
             <td style="padding:12px 8px; text-align:right; font-size:13px;">{fired_display}</td>
             <td style="padding:12px 8px; text-align:right; color:#6b7280; font-size:13px;">{cpu_display}</td>
             <td style="padding:12px 8px; text-align:center;">
-                <span style="display:inline-block; background:{action_color}15; color:{action_color}; 
-                       border:1px solid {action_color}40; border-radius:4px; 
-                       padding:2px 8px; font-size:11px; font-weight:700;">
-                    {rec['action']}
-                </span>
+                {action_badge}
             </td>
             <td style="padding:12px 8px; font-size:12px; color:#374151; min-width:280px; max-width:380px;">
                 {rec_html}
             </td>
         </tr>"""
 
+
+def _summary_stats(rules_analyzed):
+    """Resumen en una sola pasada: (críticas, altas, medias, cpu_total_s)."""
+    if np is not None and rules_analyzed:
+        n = len(rules_analyzed)
+        avg = np.fromiter((r.avg_test_ms for r in rules_analyzed), dtype=np.float64, count=n)
+        cpu = np.fromiter((r.total_test_time_s for r in rules_analyzed), dtype=np.float64, count=n)
+        sev = np.searchsorted(np.asarray(_SEV_EDGES_MS), avg, side="right")
+        counts = np.bincount(sev, minlength=4)
+        return int(counts[3]), int(counts[2]), int(counts[1]), float(cpu.sum())
+
+    critical = high = medium = 0
+    total_cpu_s = 0.0
+    for r in rules_analyzed:
+        avg_ms = r.avg_test_ms
+        if avg_ms >= _SEV_EDGES_MS[2]:
+            critical += 1
+        elif avg_ms >= _SEV_EDGES_MS[1]:
+            high += 1
+        elif avg_ms >= _SEV_EDGES_MS[0]:
+            medium += 1
+        total_cpu_s += r.total_test_time_s
+    return critical, high, medium, total_cpu_s
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# GENERADOR DE REPORTE HTML
+# ─────────────────────────────────────────────────────────────────────────────
+def stream_html_report(rules_analyzed, source_file, top_n, threshold_ms, now):
+    """Genera el reporte HTML por tramos: cabecera, filas y cierre.
+
+    Devuelve un generador de fragmentos listos para ``f.writelines()``; el
+    documento nunca se materializa completo en memoria. ``now`` llega ya
+    resuelto desde main() para que cabecera, pie y nombre de archivo
+    compartan el mismo instante.
+    """
+
+    now_str = now.strftime("%Y-%m-%d %H:%M:%S")
+    ep_name = Path(source_file).stem
+    total_rules_in_file = len(rules_analyzed) + 0  # ajustar si se filtró
+    # Conteos por tier y CPU acumulada, todo en una sola pasada
+    critical_count, high_count, medium_count, total_cpu_s = _summary_stats(rules_analyzed)
+
+    # Top N para mostrar: selección parcial O(N log top) cuando top_n ≪ N,
+    # en lugar de ordenar la lista completa (nlargest es estable, igual que sort)
+    if top_n < len(rules_analyzed):
+        display_rules = heapq.nlargest(top_n, rules_analyzed, key=lambda r: r.avg_test_ms)
+    else:
+        display_rules = sorted(rules_analyzed, key=lambda r: r.avg_test_ms, reverse=True)
+
     # Generar resumen ejecutivo
     top3_names = "<br>".join([
-        f"<b>#{i+1}</b> {r['name']} ({r['avg_test_ms']:.1f}ms)"
+        f"<b>#{i+1}</b> {r.name} ({r.avg_test_ms:.1f}ms)"
         for i, r in enumerate(display_rules[:3])
     ])
 
-    html = f"""<!DOCTYPE html>
+    yield f"""<!DOCTYPE html>
 <html lang="es">
 <head>
     <meta charset="UTF-8">
@@ -380,7 +560,7 @@ def generate_html_report(rules_analyzed, source_file, top_n, threshold_ms):
     <h1>⚡ QRadar — Expensive Rules Analyzer</h1>
     <div class="meta">
         Fuente: <strong>{ep_name}</strong> &nbsp;|&nbsp; 
-        Generado: <strong>{now}</strong> &nbsp;|&nbsp; 
+        Generado: <strong>{now_str}</strong> &nbsp;|&nbsp; 
         Umbral análisis: <strong>&gt;{threshold_ms}ms</strong> &nbsp;|&nbsp;
         Mostrando top: <strong>{top_n} reglas</strong>
     </div>
@@ -461,7 +641,66 @@ def generate_html_report(rules_analyzed, source_file, top_n, threshold_ms):
                 </tr>
             </thead>
             <tbody>
-                {rows_html}
+                """
+
+    # Clasificación de severidad y barras de calor en lote: una sola pasada
+    # searchsorted/minimum en C en vez de N llamadas Python en el loop de filas.
+    if np is not None and display_rules:
+        _avgs = np.fromiter((r.avg_test_ms for r in display_rules),
+                            dtype=np.float64, count=len(display_rules))
+        _sev_idx = np.searchsorted(np.asarray(_SEV_EDGES_MS), _avgs, side="right")
+        _bar_pcts = np.minimum(100.0, _avgs / (CRIT_MS * 2) * 100.0)
+    else:
+        _sev_idx = _bar_pcts = None
+
+    # Filas de la tabla: cada fila se emite en cuanto se formatea,
+    # nunca se acumulan en una lista intermedia
+    for i, rule in enumerate(display_rules, 1):
+        if _sev_idx is not None:
+            sev_label, sev_color, sev_icon = _SEV_TABLE[_sev_idx[i - 1]]
+        else:
+            sev_label, sev_color, sev_icon = classify_severity(rule.avg_test_ms)
+        rec = get_recommendation(rule)
+
+        sev_badge = SEV_BADGE_HTML[sev_label]
+        action_badge = ACTION_BADGE_HTML.get(rec["action"]) or _badge("#6b7280", rec["action"])
+
+        rec_html = "".join((
+            "<ul style='margin:4px 0 0 0; padding-left:18px;'>",
+            *(f"<li style='margin-bottom:4px;'>{detail}</li>" for detail in rec["details"]),
+            "</ul>",
+        ))
+
+        fired_display = f"{rule.fired_count:,}" if rule.fired_count > 0 else '<span style="color:#9ca3af">0</span>'
+        cpu_total = rule.total_test_time_s
+        cpu_display = f"{cpu_total:.2f}s" if cpu_total < 60 else f"{cpu_total/60:.1f}min"
+
+        # Barra de calor para avg_test_ms
+        if _bar_pcts is not None:
+            bar_pct = float(_bar_pcts[i - 1])
+        else:
+            bar_pct = min(100, (rule.avg_test_ms / (CRIT_MS * 2)) * 100)
+
+        # format_map sobre un dict evita el re-empaquetado de kwargs de
+        # .format() y una docena de f-strings pequeños por fila
+        yield _ROW_TMPL.format_map({
+            "i": i,
+            "name": rule.name,
+            "folder": rule.folder,
+            "id_div": f'<div style="font-size:11px; color:#9ca3af;">ID: {rule.id}</div>' if rule.id else "",
+            "sev_badge": sev_badge,
+            "sev_color": sev_color,
+            "avg_ms": rule.avg_test_ms,
+            "bar_pct": bar_pct,
+            "max_ms": rule.max_test_ms,
+            "tested": rule.total_test_count,
+            "fired_display": fired_display,
+            "cpu_display": cpu_display,
+            "action_badge": action_badge,
+            "rec_html": rec_html,
+        })
+
+    yield f"""
             </tbody>
         </table>
     </div>
@@ -519,15 +758,13 @@ def generate_html_report(rules_analyzed, source_file, top_n, threshold_ms):
 </div>
 
 <div class="footer">
-    Generado por QRadar Expensive Rules Analyzer &nbsp;·&nbsp; {now} &nbsp;·&nbsp; 
+    Generado por QRadar Expensive Rules Analyzer &nbsp;·&nbsp; {now_str} &nbsp;·&nbsp; 
     Fuente: {source_file}
 </div>
 
 </body>
 </html>"""
 
-    return html
-
 
 # ─────────────────────────────────────────────────────────────────────────────
 # MAIN
@@ -544,46 +781,68 @@ def main():
 
     all_rules = []
 
+    existing = []
     for filepath in args.input_files:
         if not os.path.exists(filepath):
             print(f"[ERROR] No se encontró el archivo: {filepath}", file=sys.stderr)
             continue
-
-        print(f"[INFO] Procesando: {filepath}")
-        rules = parse_tsv(filepath)
-        print(f"       → {len(rules):,} reglas parseadas")
-        all_rules.extend(rules)
+        existing.append(filepath)
+
+    if len(existing) > 1:
+        # Con varios archivos (CustomRule-*.txt) el parseo es CPU-bound e
+        # independiente por archivo: repartirlo entre procesos.
+        with ProcessPoolExecutor() as pool:
+            for filepath, rules in zip(existing, pool.map(parse_tsv, existing)):
+                print(f"[INFO] Procesando: {filepath}")
+                print(f"       → {len(rules):,} reglas parseadas")
+                all_rules.extend(rules)
+    else:
+        for filepath in existing:
+            print(f"[INFO] Procesando: {filepath}")
+            rules = parse_tsv(filepath)
+            print(f"       → {len(rules):,} reglas parseadas")
+            all_rules.extend(rules)
 
     if not all_rules:
         print("[ERROR] No se pudieron parsear reglas. Verificar formato del archivo.", file=sys.stderr)
         sys.exit(1)
 
-    # Filtrar por umbral mínimo
+    # Filtrar por umbral mínimo. Con numpy el filtro y los conteos por tier
+    # salen de un único vector de promedios (SoA); la lista de objetos solo
+    # se indexa para las filas que sobreviven.
     threshold_s = args.threshold_ms / 1000
-    filtered = [r for r in all_rules if r["avg_test_ms"] >= args.threshold_ms]
+    if np is not None and all_rules:
+        avg = np.fromiter((r.avg_test_ms for r in all_rules), np.float64, len(all_rules))
+        mask = avg >= args.threshold_ms
+        filtered = [all_rules[i] for i in np.flatnonzero(mask)]
+        sev = np.searchsorted(np.asarray(_SEV_EDGES_MS), avg[mask], side="right")
+        tier_counts = np.bincount(sev, minlength=4)
+        critical_n, high_n, medium_n = int(tier_counts[3]), int(tier_counts[2]), int(tier_counts[1])
+    else:
+        filtered = [r for r in all_rules if r.avg_test_ms >= args.threshold_ms]
+        critical_n, high_n, medium_n, _ = _summary_stats(filtered)
     print(f"[INFO] Reglas sobre umbral {args.threshold_ms}ms: {len(filtered):,} de {len(all_rules):,} totales")
 
-    # Ordenar por avg_test_ms descendente
-    filtered.sort(key=lambda r: r["avg_test_ms"], reverse=True)
+    # El ranking descendente por avg_test_ms lo resuelve el propio reporte
+    # (selección parcial del top N), no hace falta ordenar todo aquí
 
-    # Generar reporte
-    source_label = ", ".join(args.input_files)
-    html = generate_html_report(filtered, source_label, args.top, args.threshold_ms)
-
-    # Guardar
+    # Un único instante de generación: el mismo datetime alimenta el nombre
+    # del archivo y los sellos de cabecera/pie del reporte
+    now = datetime.now()
     if args.output:
         out_path = args.output
     else:
-        ts = datetime.now().strftime("%Y%m%d-%H%M%S")
-        out_path = f"qradar_expensive_rules_{ts}.html"
+        out_path = f"qradar_expensive_rules_{now.strftime('%Y%m%d-%H%M%S')}.html"
 
+    # Generar y volcar el reporte por tramos, sin materializarlo completo
+    source_label = ", ".join(args.input_files)
     with open(out_path, "w", encoding="utf-8") as f:
-        f.write(html)
+        f.writelines(stream_html_report(filtered, source_label, args.top, args.threshold_ms, now))
 
     print(f"[OK] Reporte generado: {out_path}")
-    print(f"     → Reglas críticas (>100ms): {sum(1 for r in filtered if r['avg_test_ms'] >= 100)}")
-    print(f"     → Reglas altas   (>50ms):   {sum(1 for r in filtered if 50 <= r['avg_test_ms'] < 100)}")
-    print(f"     → Reglas medias  (>20ms):   {sum(1 for r in filtered if 20 <= r['avg_test_ms'] < 50)}")
+    print(f"     → Reglas críticas (>100ms): {critical_n}")
+    print(f"     → Reglas altas   (>50ms):   {high_n}")
+    print(f"     → Reglas medias  (>20ms):   {medium_n}")
 
 
 if __name__ == "__main__":